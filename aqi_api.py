@@ -7,7 +7,7 @@
 1. 從環境部開放資料 API（資料集代碼：aqx_p_432）取得「全台即時 AQI」資料。
 2. 將 API 回傳的 JSON 轉成 pandas DataFrame 方便後續處理。
 3. 進行空間計算：每個測站到「台北車站」的距離（公里）。
-4. 使用 folium 產生互動式地圖（輸出 HTML），並把資料輸出為 CSV/JSON。
+4. 使用 folium 產生互動式地圖（輸出 HTML），並把資料輸出為 CSV/JSON/Parquet。
 
 輸入：
 - `.env` 內的 API Key（優先讀取 `MOENV_API_KEY`，備援 `API_KEY`）
@@ -15,32 +15,109 @@
 輸出（存放於 `./outputs/`）：
 - aqi_data_YYYYMMDD_HHMMSS.csv
 - aqi_data_YYYYMMDD_HHMMSS.json
+- aqi_data_YYYYMMDD_HHMMSS.parquet（需安裝 pyarrow）
 - aqi_map_YYYYMMDD_HHMMSS.html
 """
 
+import importlib.util
 import os
 import requests
 import json
+import numpy as np
 import pandas as pd
-import folium
 import urllib3
 import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# orjson 為選用套件：解析/輸出 JSON 都比標準函式庫快，且直接處理 bytes
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
 
 # 禁用 SSL 警告：
 # 有些環境（例如校園網路/特定憑證鏈）可能會遇到 SSL 憑證驗證問題。
-# 這裡搭配 requests.get(..., verify=False) 使用，因此需要關閉 InsecureRequestWarning。
+# 這裡搭配 session.verify = False 使用，因此需要關閉 InsecureRequestWarning。
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # 載入環境變數：
 # 會讀取同目錄下的 .env，將其中的 KEY=VALUE 載入到環境變數。
 load_dotenv()
 
+# 主要端點超過這個秒數仍未回應時，才另外向備援端點送出請求（hedged request）
+ENDPOINT_HEDGE_DELAY = 2.0
+
+# 距離計算的筆數達到這個門檻才改用 numba 核心：
+# 全台約 85 個測站時 numpy 向量化只需幾微秒，載入 numba 與編譯（或讀取快取）
+# 的固定成本（數百毫秒）與平行執行緒啟動成本都遠大於省下的時間
+NUMBA_MIN_ROWS = 100_000
+
 # 台北車站座標（WGS84）：作為距離計算的目標點
 TAIPEI_MAIN_STATION_LAT = 25.0478
 TAIPEI_MAIN_STATION_LON = 121.5170
 
+# API 欄位（經 _fold_key 正規化後的名稱）-> 專案內一致的欄位名稱
+# 輸出的欄位順序也依照這裡的順序
+API_COLUMN_MAP = {
+    'siteid': 'site_id',
+    'sitename': 'site_name',
+    'county': 'county',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'aqi': 'aqi',
+    'pm25': 'pm25',
+    'status': 'status',
+    'pollutant': 'pollutant',
+    'publishtime': 'publish_time',
+    'windspeed': 'wind_speed',
+    'winddirec': 'wind_direction',
+}
+
+# 地圖測站圖層的 JS 樣板（由 create_aqi_map 搭配 folium.MacroElement 使用）：
+# 所有測站資料以一份 JSON 陣列嵌入，再用單一迴圈建立 L.circleMarker
+STATION_LAYER_TEMPLATE = """
+{% macro script(this, kwargs) %}
+    (function () {
+        var stations = {{ this.stations|tojson }};
+        stations.forEach(function (s) {
+            L.circleMarker([s.lat, s.lon], {
+                radius: 10,
+                color: s.color,
+                fillColor: s.color,
+                fill: true,
+                fillOpacity: 0.7,
+                weight: 2
+            })
+                .bindPopup(s.popup, {maxWidth: 300})
+                .bindTooltip(s.tooltip)
+                .addTo({{ this._parent.get_name() }});
+        });
+    })();
+{% endmacro %}
+"""
+
+# 叢集模式（FastMarkerCluster）的 JS callback：每列資料為 [lat, lon, color, popup, tooltip]
+STATION_CLUSTER_CALLBACK = """
+function (row) {
+    return L.circleMarker([row[0], row[1]], {
+        radius: 10,
+        color: row[2],
+        fillColor: row[2],
+        fill: true,
+        fillOpacity: 0.7,
+        weight: 2
+    }).bindPopup(row[3], {maxWidth: 300}).bindTooltip(row[4]);
+}
+"""
+
 
 def haversine_km(lat1, lon1, lat2, lon2):
     """使用 Haversine 公式計算兩個經緯度點之間的球面距離（公里）。
@@ -48,16 +125,173 @@ def haversine_km(lat1, lon1, lat2, lon2):
     為什麼不用平面距離？
     - 經緯度在地球表面是球面座標；Haversine 是常用的近似計算方式。
     - 對台灣尺度的距離估算已足夠。
+
+    參數可以是純量或 numpy 陣列（會自動 broadcast），
+    傳入整欄座標時在 C 層級一次算完，不需要逐列呼叫。
     """
     r = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    d_phi = math.radians(lat2 - lat1)
-    d_lambda = math.radians(lon2 - lon1)
-    a = math.sin(d_phi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2.0) ** 2
-    c = 2.0 * math.atan2(math.sqrt(a), math.sqrt(1.0 - a))
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    d_phi = np.radians(np.subtract(lat2, lat1))
+    d_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(d_phi / 2.0) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2.0) ** 2
+    c = 2.0 * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
     return r * c
 
+
+def equirect_km(lat, lon, lat0, lon0):
+    """以等距圓柱（equirectangular）近似計算 (lat, lon) 到 (lat0, lon0) 的距離（公里）。
+
+    台灣各測站距離台北車站都在約 400 公里內，這個尺度下平面近似與 Haversine
+    的差距極小，卻省去 atan2 與大部分的三角函數運算。
+    經度差以兩點的「中間緯度」做 cos 修正，比固定用其中一點的緯度更準確。
+    可傳入純量或 numpy 陣列。
+    """
+    r = 6371.0
+    x = np.subtract(lon, lon0) * np.cos(np.radians(np.add(lat, lat0) / 2.0))
+    y = np.subtract(lat, lat0)
+    return r * np.radians(np.hypot(x, y))
+
+
+# numba 距離核心的快取：None 表示尚未載入；False 表示未安裝 numba
+_numba_kernels = None
+
+
+def _get_numba_kernels():
+    """延遲載入 numba 並建立距離計算核心，回傳 (equirect, haversine)；未安裝 numba 時回傳 None。
+
+    numba 為選用套件，import 本身就要數百毫秒，因此不在模組載入時匯入，
+    只有資料量達到 NUMBA_MIN_ROWS 時才會第一次呼叫這裡。
+    """
+    global _numba_kernels
+    if _numba_kernels is None:
+        try:
+            from numba import njit, prange
+        except ImportError:
+            _numba_kernels = False
+            return None
+
+        @njit(parallel=True, fastmath=True, cache=True)
+        def equirect_batch(lats, lons, lat0, lon0, out):
+            """numba 版本的 equirect_km：單一迴圈逐點計算，結果寫入 out。
+
+            不會產生 numpy 版本的中間暫存陣列。
+            """
+            r = 6371.0
+            for i in prange(lats.shape[0]):
+                x = (lons[i] - lon0) * math.cos(math.radians((lats[i] + lat0) / 2.0))
+                y = lats[i] - lat0
+                out[i] = r * math.radians(math.hypot(x, y))
+
+        @njit(parallel=True, fastmath=True, cache=True)
+        def haversine_batch(lats, lons, lat0, lon0, out):
+            """numba 版本的 haversine_km（目標點固定為 lat0/lon0），結果寫入 out。"""
+            r = 6371.0
+            phi0 = math.radians(lat0)
+            cos_phi0 = math.cos(phi0)
+            for i in prange(lats.shape[0]):
+                phi1 = math.radians(lats[i])
+                d_phi = phi0 - phi1
+                d_lambda = math.radians(lon0 - lons[i])
+                a = math.sin(d_phi / 2.0) ** 2 + math.cos(phi1) * cos_phi0 * math.sin(d_lambda / 2.0) ** 2
+                out[i] = r * 2.0 * math.atan2(math.sqrt(a), math.sqrt(1.0 - a))
+
+        _numba_kernels = (equirect_batch, haversine_batch)
+    return _numba_kernels or None
+
+
+def equirect_km_array(lats, lons, lat0, lon0):
+    """計算一整批點到單一目標點 (lat0, lon0) 的 equirect_km 距離（公里）。
+
+    筆數達到 NUMBA_MIN_ROWS 且有安裝 numba 時使用編譯後的平行迴圈；
+    其餘情況（包含全台測站這種小資料量）直接使用 numpy 版本的 equirect_km。
+    """
+    lats = np.ascontiguousarray(lats, dtype=np.float64)
+    lons = np.ascontiguousarray(lons, dtype=np.float64)
+    kernels = _get_numba_kernels() if lats.shape[0] >= NUMBA_MIN_ROWS else None
+    if kernels is None:
+        return equirect_km(lats, lons, lat0, lon0)
+    out = np.empty_like(lats)
+    kernels[0](lats, lons, float(lat0), float(lon0), out)
+    return out
+
+
+def haversine_km_array(lats, lons, lat0, lon0):
+    """計算一整批點到單一目標點 (lat0, lon0) 的精確 Haversine 距離（公里）。
+
+    需要完整 Haversine（而非 equirect_km 近似）時使用，例如對已儲存的資料做查詢。
+    筆數達到 NUMBA_MIN_ROWS 且有安裝 numba 時使用編譯後的平行迴圈；否則使用 numpy 版本的 haversine_km。
+    """
+    lats = np.ascontiguousarray(lats, dtype=np.float64)
+    lons = np.ascontiguousarray(lons, dtype=np.float64)
+    kernels = _get_numba_kernels() if lats.shape[0] >= NUMBA_MIN_ROWS else None
+    if kernels is None:
+        return haversine_km(lats, lons, lat0, lon0)
+    out = np.empty_like(lats)
+    kernels[1](lats, lons, float(lat0), float(lon0), out)
+    return out
+
+
+def _fold_key(name):
+    """把欄位名稱正規化：轉小寫並移除 . 與 _（例如 PM2.5 -> pm25、WindDirec -> winddirec）。"""
+    return str(name).lower().replace(".", "").replace("_", "")
+
+
+def _fold_columns(df):
+    """將 DataFrame 欄位名稱一次正規化，大小寫不同的同名欄位合併成一欄。
+
+    EPA 舊格式(大寫)與 MOENV 新格式(小寫)會變成同一個欄位名稱，
+    後續只需要用單一名稱（例如 'aqi'、'pm25'、'sitename'）取值。
+    """
+    groups = {}
+    for col in df.columns:
+        groups.setdefault(_fold_key(col), []).append(col)
+
+    folded = {}
+    for key, cols in groups.items():
+        series = df[cols[0]]
+        for col in cols[1:]:
+            series = series.combine_first(df[col])
+        folded[key] = series
+    return pd.DataFrame(folded, index=df.index)
+
+def _write_csv(df, path):
+    """把 DataFrame 寫成 UTF-8（含 BOM）的 CSV 檔，讓 Excel 開啟中文欄位不容易亂碼。
+
+    有安裝 pyarrow 時使用其 C++ 多執行緒 CSV 寫入器；否則使用 pandas 的 to_csv。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+        return
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with open(path, 'wb') as f:
+        # 手動寫入 UTF-8 BOM，效果等同 encoding='utf-8-sig'
+        f.write(b'\xef\xbb\xbf')
+        pacsv.write_csv(table, f)
+
+
+def _write_json(df, path):
+    """把 DataFrame 以 records 格式（縮排 2、保留中文）寫成 JSON 檔。
+
+    有安裝 orjson 時直接序列化成 bytes 寫入；否則使用 pandas 的 to_json。
+    """
+    if orjson is None:
+        df.to_json(path, orient='records', force_ascii=False, indent=2)
+        return
+
+    # 缺值（NaN / pd.NA）統一轉成 None，輸出為 JSON 的 null
+    records = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(records, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+def _write_parquet(df, path):
+    """把 DataFrame 寫成 zstd 壓縮的 Parquet 檔（需要 pyarrow）。"""
+    df.to_parquet(path, compression='zstd', index=False)
+
 class AQIAPI:
     def __init__(self):
         # 讀取 API Key：
@@ -72,6 +306,36 @@ class AQIAPI:
             "https://data.moenv.gov.tw/api/v2",
             "https://data.epa.gov.tw/api/v2",
         ]
+
+        # 共用的 requests.Session：
+        # - 連線池（keep-alive）讓第二個端點與之後的呼叫可重用 TCP/TLS 連線
+        # - verify=False 與查詢參數只需設定一次
+        # - HTTPAdapter 只針對伺服器暫時性錯誤（狀態碼 500/502/503/504）重試（含 backoff）
+        # - 連線失敗/讀取逾時不重試（connect=0, read=0）：直接交給 fetch_aqi_data 改試備援端點，
+        #   否則每次逾時都會被重試放大好幾倍等待時間
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.headers.update({
+            "Accept": "application/json",
+            "User-Agent": "aqi-analysis/1.0",
+        })
+        self.session.params = {
+            "api_key": self.api_key,
+            "format": "JSON",
+        }
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(
+                total=3,
+                connect=0,
+                read=0,
+                backoff_factor=0.3,
+                status_forcelist=[500, 502, 503, 504],
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         if not self.api_key:
             # 沒有 API key 就不往下跑，避免發送匿名/錯誤請求
@@ -80,7 +344,51 @@ class AQIAPI:
             return
         
         print(f"API金鑰已載入: {self.api_key[:8]}...")
+
+    def close(self):
+        """關閉 requests.Session，釋放連線池中的連線"""
+        self.session.close()
+
+    def __enter__(self):
+        # 支援 with AQIAPI() as api: 的寫法，離開區塊時自動 close()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
     
+    def _request_endpoint(self, base_url):
+        """
+        向單一 API 端點發出請求並解析 JSON（由 fetch_aqi_data 在背景執行緒中呼叫）
+        
+        Args:
+            base_url (str): API 端點
+        
+        Returns:
+            dict: API回應資料
+        """
+        url = f"{base_url}/aqx_p_432"
+        print(f"正在獲取空氣品質資料... ({base_url})")
+
+        # session 已設定 verify=False：避免 SSL 憑證問題阻擋資料抓取（課堂環境常見）
+        # timeout=(連線, 讀取)：連線與讀取逾時都不重試（見 session 的 Retry 設定），
+        # 因此連不上的端點最多 10 秒就放棄；讀取保留 30 秒，避免資料量較大時被誤判逾時
+        response = self.session.get(url, timeout=(10, 30))
+
+        # HTTP 狀態碼非 2xx 會在這裡丟出例外
+        response.raise_for_status()
+
+        # 解析 JSON：直接使用原始 bytes，省去先解碼成 str 的步驟
+        data = _json_loads(response.content)
+
+        # 部分端點可能直接回傳 list[dict]，這裡統一成 dict 格式
+        if isinstance(data, list):
+            data = {
+                "success": True,
+                "records": data,
+            }
+        return data
+
     def fetch_aqi_data(self):
         """
         獲取全台AQI資料
@@ -88,56 +396,63 @@ class AQIAPI:
         Returns:
             dict: API回應資料
         """
-        # API 查詢參數：
-        # - api_key：授權金鑰
-        # - format：回傳格式（JSON）
-        params = {
-            "api_key": self.api_key,
-            "format": "JSON"
-        }
+        # API 查詢參數（api_key / format）已設定在 self.session.params
 
-        # last_error 用於記錄最後一次錯誤，若全部端點都失敗可提供診斷訊息
-        last_error = None
-        for base_url in self.base_urls:
-            url = f"{base_url}/aqx_p_432"
-            try:
-                print(f"正在獲取空氣品質資料... ({base_url})")
+        # 依 self.base_urls 的順序優先使用主要端點：
+        # - 主要端點在 ENDPOINT_HEDGE_DELAY 秒內沒有回應，才同時向下一個端點送出請求
+        # - 任一端點失敗（連線錯誤、success=False）就立刻改試下一個端點
+        # - 請求放在 daemon 執行緒中，函式回傳後不會因較慢的端點卡住程式結束
+        results = queue.Queue()
+        pending_urls = list(self.base_urls)
+        in_flight = 0
 
-                # verify=False：避免 SSL 憑證問題阻擋資料抓取（課堂環境常見）
-                response = requests.get(url, params=params, timeout=30, verify=False)
+        def request_worker(base_url):
+            try:
+                results.put((base_url, self._request_endpoint(base_url), None))
+            except Exception as e:
+                results.put((base_url, None, e))
 
-                # HTTP 狀態碼非 2xx 會在這裡丟出例外
-                response.raise_for_status()
+        def start_next_endpoint():
+            nonlocal in_flight
+            base_url = pending_urls.pop(0)
+            threading.Thread(target=request_worker, args=(base_url,), daemon=True).start()
+            in_flight += 1
 
-                # 解析 JSON
-                data = response.json()
+        # last_error 用於記錄最後一次錯誤，若全部端點都失敗可提供診斷訊息
+        last_error = None
+        start_next_endpoint()
+        while in_flight:
+            try:
+                # 還有備援端點時只等待一小段時間；全部送出後就等到有結果為止
+                base_url, data, error = results.get(timeout=ENDPOINT_HEDGE_DELAY if pending_urls else None)
+            except queue.Empty:
+                print("主要端點回應較慢，同時嘗試備援端點...")
+                start_next_endpoint()
+                continue
+            in_flight -= 1
 
-                # 部分端點可能直接回傳 list[dict]，這裡統一成 dict 格式
-                if isinstance(data, list):
-                    data = {
-                        "success": True,
-                        "records": data,
-                    }
+            if error is None and data.get("success"):
+                records = data.get("records", [])
+                print(f"成功獲取 {len(records)} 個測站資料")
+                return data
 
-                if data.get("success"):
-                    records = data.get("records", [])
-                    print(f"成功獲取 {len(records)} 個測站資料")
-                    return data
-                else:
-                    # API 回應 success=False 時，直接回傳 None
-                    print(f"API回應失敗: {data.get('message', '未知錯誤')}")
-                    return None
-
-            except requests.exceptions.RequestException as e:
+            if isinstance(error, requests.exceptions.RequestException):
                 # 任何 requests 層級錯誤（DNS、Timeout、HTTPError...）都會到這裡
-                last_error = e
-                print(f"API請求錯誤: {e}")
-                continue
-            except json.JSONDecodeError as e:
-                # 回傳內容不是合法 JSON 時會到這裡
-                last_error = e
-                print(f"JSON解析錯誤: {e}")
-                continue
+                last_error = error
+                print(f"API請求錯誤 ({base_url}): {error}")
+            elif isinstance(error, json.JSONDecodeError):
+                # 回傳內容不是合法 JSON 時會到這裡（orjson.JSONDecodeError 也是其子類別）
+                last_error = error
+                print(f"JSON解析錯誤 ({base_url}): {error}")
+            elif error is not None:
+                # 非預期的錯誤照常往外丟，不默默吞掉
+                raise error
+            else:
+                print(f"API回應失敗 ({base_url}): {data.get('message', '未知錯誤')}")
+
+            # 這個端點失敗了：還有沒試過的端點就立刻送出，不必等待
+            if pending_urls:
+                start_next_endpoint()
 
         if last_error is not None:
             # 所有端點都失敗時，提供常見排除方向
@@ -162,73 +477,41 @@ class AQIAPI:
             return None
         
         # records 是一個 list，每個元素是一個測站的資料（dict）
-        records = data["records"]
-        processed_data = []
-        
-        for record in records:
-            try:
-                # 同時支援 EPA 舊格式(大寫)與 MOENV 新格式(小寫)
-                # 例如：
-                # - 新格式：latitude / longitude / aqi / sitename / county
-                # - 舊格式：Latitude / Longitude / AQI / SiteName / County
-                latitude_raw = record.get("Latitude") if record.get("Latitude") is not None else record.get("latitude")
-                longitude_raw = record.get("Longitude") if record.get("Longitude") is not None else record.get("longitude")
-                
-                # 處理座標資料：轉成 float
-                lat = float(latitude_raw) if latitude_raw not in (None, "") else None
-                lon = float(longitude_raw) if longitude_raw not in (None, "") else None
-                
-                # 處理 AQI 數值：
-                # API 有時會用字串回傳（例如 "86"），因此先轉 float 再轉 int
-                aqi_raw = record.get("AQI") if record.get("AQI") is not None else record.get("aqi")
-                aqi = None
-                if aqi_raw not in (None, ""):
-                    try:
-                        aqi = int(float(aqi_raw))
-                    except (ValueError, TypeError):
-                        aqi = None
-                
-                # 處理 PM2.5：同樣可能是字串或空值
-                pm25_raw = (
-                    record.get("PM2.5")
-                    if record.get("PM2.5") is not None
-                    else (record.get("pm2.5") if record.get("pm2.5") is not None else record.get("pm25"))
-                )
-                pm25 = None
-                if pm25_raw not in (None, ""):
-                    try:
-                        pm25 = float(pm25_raw)
-                    except (ValueError, TypeError):
-                        pm25 = None
-                
-                # 轉成「我們專案內一致的欄位名稱」方便後續 map / export
-                station_data = {
-                    'site_id': record.get("SiteId") if record.get("SiteId") is not None else record.get("siteid", ""),
-                    'site_name': record.get("SiteName") if record.get("SiteName") is not None else record.get("sitename", ""),
-                    'county': record.get("County") if record.get("County") is not None else record.get("county", ""),
-                    'latitude': lat,
-                    'longitude': lon,
-                    'aqi': aqi,
-                    'pm25': pm25,
-                    'status': record.get("Status") if record.get("Status") is not None else record.get("status", ""),
-                    'pollutant': record.get("Pollutant") if record.get("Pollutant") is not None else record.get("pollutant", ""),
-                    'publish_time': record.get("PublishTime") if record.get("PublishTime") is not None else record.get("publishtime", ""),
-                    'wind_speed': record.get("WindSpeed") if record.get("WindSpeed") is not None else record.get("wind_speed", ""),
-                    'wind_direction': record.get("WindDirec") if record.get("WindDirec") is not None else record.get("wind_direc", "")
-                }
-                
-                processed_data.append(station_data)
-                
-            except (ValueError, TypeError) as e:
-                print(f"處理測站 {record.get('SiteName', 'unknown')} 資料時發生錯誤: {e}")
-                continue
-        
-        # 將 list[dict] 轉成 DataFrame
-        df = pd.DataFrame(processed_data)
+        # 直接整批轉成 DataFrame，之後以「欄」為單位做向量化轉換，
+        # 不再逐筆 record 做 .get() 與型別轉換
+        raw = pd.DataFrame(data["records"])
+
+        # 同時支援 EPA 舊格式(大寫)與 MOENV 新格式(小寫)：
+        # 欄位名稱只在這裡正規化一次，之後每個欄位只用單一名稱取值
+        # 例如：Latitude / latitude -> latitude、PM2.5 / pm2.5 / pm25 -> pm25
+        # reindex 保證所有欄位都存在（API 沒給的欄位會是全空值），
+        # rename 再轉成「我們專案內一致的欄位名稱」方便後續 map / export
+        df = (
+            _fold_columns(raw)
+            .reindex(columns=list(API_COLUMN_MAP))
+            .rename(columns=API_COLUMN_MAP)
+        )
 
-        # 過濾掉無效座標的資料
-        df = df[df['latitude'].notna() & df['longitude'].notna()]
-        df = df[(df['latitude'] != 0) & (df['longitude'] != 0)]
+        # 文字欄位：缺值統一成空字串，並使用 pandas 的 string 型別（而非 object）
+        text_columns = [col for col in df.columns if col not in ('latitude', 'longitude', 'aqi', 'pm25')]
+        df[text_columns] = df[text_columns].fillna("").astype("string")
+
+        # 處理座標資料：轉成 float（空字串/非數字會變成 NaN）
+        df['latitude'] = pd.to_numeric(df['latitude'], errors="coerce")
+        df['longitude'] = pd.to_numeric(df['longitude'], errors="coerce")
+
+        # 處理 AQI 數值：
+        # API 有時會用字串回傳（例如 "86"），轉成數字後取整數，缺值保留為 <NA>
+        # 使用可為空值的 Int64，避免整欄退化成 object 或 float
+        df['aqi'] = np.trunc(pd.to_numeric(df['aqi'], errors="coerce")).astype("Int64")
+
+        # 處理 PM2.5：同樣可能是字串或空值
+        df['pm25'] = pd.to_numeric(df['pm25'], errors="coerce").astype("Float64")
+
+        # 過濾掉無效座標的資料（單一布林遮罩）
+        lat = df['latitude']
+        lon = df['longitude']
+        df = df[lat.notna() & lon.notna() & (lat != 0) & (lon != 0)]
         
         return df
 
@@ -240,20 +523,16 @@ class AQIAPI:
         if df is None or df.empty:
             return df
 
-        # copy() 避免修改到原始 df（保留函式式風格，較安全）
-        df = df.copy()
+        # 以 numpy 陣列一次計算所有測站距離（避免 DataFrame.apply 逐列呼叫）
+        lats = df['latitude'].to_numpy(dtype=np.float64)
+        lons = df['longitude'].to_numpy(dtype=np.float64)
+        # 台灣尺度下使用等距圓柱近似（equirect_km）即可，與 Haversine 的差距極小；
+        # 測站數量少時一律走 numpy，不會載入 numba
+        distances = equirect_km_array(lats, lons, TAIPEI_MAIN_STATION_LAT, TAIPEI_MAIN_STATION_LON)
 
-        # 使用 DataFrame.apply 逐列計算距離
-        df['distance_to_taipei_main_km'] = df.apply(
-            lambda r: haversine_km(
-                float(r['latitude']),
-                float(r['longitude']),
-                TAIPEI_MAIN_STATION_LAT,
-                TAIPEI_MAIN_STATION_LON,
-            ),
-            axis=1,
-        )
-        return df
+        # assign() 回傳帶有新欄位的新 DataFrame，不修改原始 df，
+        # 也不需要先 copy() 複製整份資料
+        return df.assign(distance_to_taipei_main_km=distances)
     
     def get_aqi_color(self, aqi):
         """
@@ -265,8 +544,8 @@ class AQIAPI:
         Returns:
             str: 顏色代碼
         """
-        # 若該測站沒有 AQI（空值），使用灰色
-        if aqi is None:
+        # 若該測站沒有 AQI（None / NaN / pd.NA），使用灰色
+        if pd.isna(aqi):
             return 'gray'
         
         # 作業需求的三段分色：
@@ -278,6 +557,22 @@ class AQIAPI:
         else:
             return 'red'
     
+    def get_aqi_colors(self, aqi):
+        """
+        get_aqi_color 的向量化版本：一次回傳整欄 AQI 對應的顏色
+        
+        Args:
+            aqi (pd.Series): AQI數值（可含缺值）
+        
+        Returns:
+            np.ndarray: 顏色代碼陣列
+        """
+        # pd.cut 一次完成分段（0-50 / 51-100 / 101+），規則與 get_aqi_color 相同；
+        # 缺值不屬於任何區間，最後補成灰色
+        values = pd.Series(aqi).astype(float)
+        colors = pd.cut(values, bins=[-np.inf, 50, 100, np.inf], labels=['green', 'yellow', 'red'])
+        return colors.astype(object).fillna('gray').to_numpy()
+    
     def get_aqi_level(self, aqi):
         """
         根據AQI數值回傳等級描述
@@ -289,7 +584,7 @@ class AQIAPI:
             str: AQI等級描述
         """
         # 這個等級描述目前主要用在程式內部（若你未來想在地圖 popup 顯示）
-        if aqi is None:
+        if pd.isna(aqi):
             return '資料不足'
         
         if aqi <= 50:
@@ -299,12 +594,13 @@ class AQIAPI:
         else:
             return '不健康'
     
-    def create_aqi_map(self, df):
+    def create_aqi_map(self, df, cluster=False):
         """
         建立AQI地圖
         
         Args:
             df (pd.DataFrame): AQI資料
+            cluster (bool, optional): 是否以 FastMarkerCluster 將鄰近測站聚合顯示
         
         Returns:
             folium.Map: AQI地圖
@@ -313,6 +609,10 @@ class AQIAPI:
         if df is None or df.empty:
             print("沒有資料可以製作地圖")
             return None
+
+        # folium 匯入成本較高，只在真的要畫地圖時才載入
+        import folium
+        from jinja2 import Template
         
         # 計算「地圖中心點」：用所有測站的平均座標當作地圖中心
         center_lat = df['latitude'].mean()
@@ -326,38 +626,55 @@ class AQIAPI:
             tiles='OpenStreetMap'
         )
         
-        # 將每個測站畫成 CircleMarker
-        for idx, row in df.iterrows():
-            try:
-                aqi = row['aqi']
-                color = self.get_aqi_color(aqi)
-                
-                # 點擊後顯示的 popup（作業需求：站名、縣市、AQI）
-                popup_content = f"""
-                <div style="width: 220px;">
-                    <b>測站:</b> {row['site_name']}<br>
-                    <b>縣市:</b> {row['county']}<br>
-                    <b>AQI:</b> {aqi if aqi is not None else 'N/A'}
-                </div>
-                """
-                
-                # tooltip：滑鼠移到點上會顯示的簡短文字
-                folium.CircleMarker(
-                    location=[row['latitude'], row['longitude']],
-                    radius=10,
-                    popup=folium.Popup(popup_content, max_width=300),
-                    tooltip=f"{row['site_name']}: AQI {aqi if aqi else 'N/A'}",
-                    color=color,
-                    fill=True,
-                    fillColor=color,
-                    fillOpacity=0.7,
-                    weight=2
-                ).add_to(m)
-                
-            except Exception as e:
-                # 單一測站資料異常時略過，避免整張地圖生成失敗
-                print(f"處理測站 {row.get('site_name', 'unknown')} 時發生錯誤: {e}")
-                continue
+        # 將所有測站整理成一份 JSON 陣列，交給單一個 MacroElement 在瀏覽器端
+        # 用一個 JS 迴圈畫出全部 CircleMarker，取代每個測站各建立一個
+        # folium 物件與各自的 <script> 區塊（Python 物件與 HTML 都大幅減少）
+        # 先把需要的欄位各取出一次成陣列再 zip，避免 iterrows 每列建立一個 Series
+        lats = df['latitude'].to_numpy()
+        lons = df['longitude'].to_numpy()
+        # 顏色在迴圈外一次算好，不必每個測站各自跑 if/elif
+        colors = self.get_aqi_colors(df['aqi'])
+
+        # popup / tooltip 文字以整欄字串相加一次組好，不必每列格式化一個 f-string
+        names = df['site_name'].astype('string')
+        counties = df['county'].astype('string')
+        # Int64 轉字串不會出現 "86.0"；缺值顯示 N/A
+        aqi_texts = df['aqi'].astype('string').fillna('N/A')
+        # 點擊後顯示的 popup（作業需求：站名、縣市、AQI）
+        popups = (
+            '<div style="width:220px"><b>測站:</b> ' + names
+            + '<br><b>縣市:</b> ' + counties
+            + '<br><b>AQI:</b> ' + aqi_texts + '</div>'
+        ).to_numpy()
+        # tooltip：滑鼠移到點上會顯示的簡短文字
+        tooltips = (names + ': AQI ' + aqi_texts).to_numpy()
+
+        if cluster:
+            # 叢集模式：資料以 [lat, lon, color, popup, tooltip] 陣列交給 FastMarkerCluster，
+            # 由瀏覽器端的 callback 建立 marker，縮小時鄰近測站會聚合成一個圓圈
+            from folium.plugins import FastMarkerCluster
+
+            rows = [
+                [float(lat), float(lon), str(color), str(popup), str(tooltip)]
+                for lat, lon, color, popup, tooltip in zip(lats, lons, colors, popups, tooltips)
+            ]
+            FastMarkerCluster(rows, callback=STATION_CLUSTER_CALLBACK).add_to(m)
+        else:
+            stations = [
+                {
+                    "lat": float(lat),
+                    "lon": float(lon),
+                    "color": str(color),
+                    "popup": str(popup),
+                    "tooltip": str(tooltip),
+                }
+                for lat, lon, color, popup, tooltip in zip(lats, lons, colors, popups, tooltips)
+            ]
+
+            station_layer = folium.MacroElement()
+            station_layer._template = Template(STATION_LAYER_TEMPLATE)
+            station_layer.stations = stations
+            m.add_child(station_layer)
         
         # 加上左下角圖例（使用 HTML 元素固定在畫面上）
         legend_html = '''
@@ -371,13 +688,14 @@ class AQIAPI:
         <p><i class="fa fa-circle" style="color:red"></i> 101+</p>
         </div>
         '''
-        m.get_root().html.add_child(folium.Element(legend_html))
         
         # 加上右下角統計資訊（同樣用固定 HTML）
         total_stations = len(df)
-        valid_aqi = len(df[df['aqi'].notna()])
-        avg_aqi = df['aqi'].mean() if valid_aqi > 0 else 0
-        max_aqi = df['aqi'].max() if valid_aqi > 0 else 0
+        # 一次 agg 取得有效筆數/平均/最大值（缺值會自動略過），不必先建立過濾後的 DataFrame
+        stats = df['aqi'].agg(['count', 'mean', 'max'])
+        valid_aqi = int(stats['count'])
+        avg_aqi = stats['mean'] if valid_aqi > 0 else 0
+        max_aqi = int(stats['max']) if valid_aqi > 0 else 0
         
         stats_html = f"""
         <div style="position: fixed; 
@@ -391,17 +709,20 @@ class AQIAPI:
         <p><b>最高AQI:</b> {max_aqi}</p>
         </div>
         """
-        m.get_root().html.add_child(folium.Element(stats_html))
+        # 圖例與統計合併成同一個 Element 加入，存檔時只需渲染一次
+        m.get_root().html.add_child(folium.Element(legend_html + stats_html))
         
         return m
     
-    def save_data(self, df, filename=None):
+    def save_data(self, df, filename=None, formats=None):
         """
         儲存AQI資料到檔案
         
         Args:
             df (pd.DataFrame): AQI資料
             filename (str, optional): 檔案名稱
+            formats (tuple, optional): 要輸出的格式（csv / json / parquet）；
+                預設為 CSV/JSON，有安裝 pyarrow 時再加上 Parquet
         """
         # 沒資料就不輸出
         if df is None or df.empty:
@@ -416,22 +737,42 @@ class AQIAPI:
         output_dir = os.path.join(".", "outputs")
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-        
-        # 儲存 CSV：使用 utf-8-sig，讓 Excel 開啟中文欄位不容易亂碼
-        csv_path = os.path.join(output_dir, f"{filename}.csv")
-        try:
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            print(f"CSV資料已儲存至: {csv_path}")
-        except Exception as e:
-            print(f"儲存CSV資料時發生錯誤: {e}")
-        
-        # 儲存 JSON：force_ascii=False 保留中文
-        json_path = os.path.join(output_dir, f"{filename}.json")
-        try:
-            df.to_json(json_path, orient='records', force_ascii=False, indent=2)
-            print(f"JSON資料已儲存至: {json_path}")
-        except Exception as e:
-            print(f"儲存JSON資料時發生錯誤: {e}")
+
+        # Parquet 需要選用套件 pyarrow：
+        # - 未指定 formats 時，只有安裝了 pyarrow 才預設輸出 Parquet（不必每次都提示）
+        # - 明確指定 parquet 卻沒有安裝時才提示並略過，不影響 CSV/JSON 輸出
+        has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+        if formats is None:
+            formats = ("csv", "json", "parquet") if has_pyarrow else ("csv", "json")
+        elif "parquet" in formats and not has_pyarrow:
+            print("未安裝 pyarrow，略過 Parquet 輸出")
+            formats = [fmt for fmt in formats if fmt != "parquet"]
+
+        # 各格式的（顯示名稱, 寫檔函式）
+        writers = {
+            # CSV：含 BOM 的 UTF-8，讓 Excel 開啟中文欄位不容易亂碼
+            "csv": ("CSV", _write_csv),
+            # JSON：保留中文（有 orjson 時使用 orjson 序列化）
+            "json": ("JSON", _write_json),
+            # Parquet：欄位式壓縮格式，檔案小、之後重新讀取分析也快很多
+            "parquet": ("Parquet", _write_parquet),
+        }
+
+        # 各格式的寫檔工作互不相依，用多個執行緒同時寫入
+        with ThreadPoolExecutor(max_workers=max(len(formats), 1)) as executor:
+            jobs = []
+            for fmt in formats:
+                label, writer = writers[fmt]
+                path = os.path.join(output_dir, f"{filename}.{fmt}")
+                jobs.append((label, path, executor.submit(writer, df, path)))
+
+        # 個別回報結果：其中一個失敗不影響其他檔案
+        for label, path, future in jobs:
+            try:
+                future.result()
+                print(f"{label}資料已儲存至: {path}")
+            except Exception as e:
+                print(f"儲存{label}資料時發生錯誤: {e}")
     
     def save_map(self, map_obj, filename=None):
         """
@@ -478,53 +819,57 @@ def main():
     print("=== 環境部空氣品質API串接程式 ===")
     
     try:
-        # 初始化 API 客戶端（讀取 .env / 準備 base_url）
-        api = AQIAPI()
-        
-        if not api.api_key:
-            print("無法繼續執行，請先設定API金鑰")
-            return
-        
-        # 1) 呼叫 API 取得原始資料
-        aqi_data = api.fetch_aqi_data()
-        
-        if aqi_data:
-            # 2) 將原始 JSON records 轉成 DataFrame
-            df = api.process_aqi_data(aqi_data)
+        # 初始化 API 客戶端（讀取 .env / 準備 base_url / 建立連線池）
+        # with 區塊結束時會自動關閉 session
+        with AQIAPI() as api:
+            if not api.api_key:
+                print("無法繼續執行，請先設定API金鑰")
+                return
+        
+            # 1) 呼叫 API 取得原始資料
+            aqi_data = api.fetch_aqi_data()
+        
+            if aqi_data:
+                # 2) 將原始 JSON records 轉成 DataFrame
+                df = api.process_aqi_data(aqi_data)
             
-            if df is not None and not df.empty:
-                print(f"\n成功處理 {len(df)} 個有效測站資料")
+                if df is not None and not df.empty:
+                    print(f"\n成功處理 {len(df)} 個有效測站資料")
                 
-                # 顯示基本統計（方便確認資料合理性）
-                print(f"\n=== AQI統計資訊 ===")
-                valid_aqi = df[df['aqi'].notna()]
-                if not valid_aqi.empty:
-                    print(f"有效AQI資料: {len(valid_aqi)} 站")
-                    print(f"AQI範圍: {valid_aqi['aqi'].min()} ~ {valid_aqi['aqi'].max()}")
-                    print(f"平均AQI: {valid_aqi['aqi'].mean():.1f}")
+                    # 顯示基本統計（方便確認資料合理性）
+                    print(f"\n=== AQI統計資訊 ===")
+                    # 一次 agg 取得筆數/最小/最大/平均（缺值自動略過），不必先篩出有效列
+                    aqi_stats = df['aqi'].agg(['count', 'min', 'max', 'mean'])
+                    valid_count = int(aqi_stats['count'])
+                    if valid_count > 0:
+                        print(f"有效AQI資料: {valid_count} 站")
+                        print(f"AQI範圍: {int(aqi_stats['min'])} ~ {int(aqi_stats['max'])}")
+                        print(f"平均AQI: {aqi_stats['mean']:.1f}")
                 
-                # 顯示前5筆資料
-                print(f"\n前5筆測站資料:")
-                for i, (_, row) in enumerate(df.head().iterrows()):
-                    aqi_str = f"{row['aqi']}" if pd.notna(row['aqi']) else "N/A"
-                    print(f"{i+1}. {row['site_name']} ({row['county']}) - AQI: {aqi_str}")
+                    # 顯示前5筆資料
+                    print(f"\n前5筆測站資料:")
+                    head = df.head()
+                    rows = zip(head['site_name'], head['county'], head['aqi'])
+                    for i, (site_name, county, aqi) in enumerate(rows):
+                        aqi_str = f"{aqi}" if pd.notna(aqi) else "N/A"
+                        print(f"{i+1}. {site_name} ({county}) - AQI: {aqi_str}")
                 
-                # 3) 空間計算：新增到台北車站距離
-                # 4) 產生 folium 地圖
-                print(f"\n正在建立AQI地圖...")
-                df = api.add_distance_to_taipei_main_station(df)
-                aqi_map = api.create_aqi_map(df)
+                    # 3) 空間計算：新增到台北車站距離
+                    # 4) 產生 folium 地圖
+                    print(f"\n正在建立AQI地圖...")
+                    df = api.add_distance_to_taipei_main_station(df)
+                    aqi_map = api.create_aqi_map(df)
                 
-                # 5) 輸出資料與地圖到 outputs/
-                api.save_data(df)
-                if aqi_map:
-                    api.save_map(aqi_map)
+                    # 5) 輸出資料與地圖到 outputs/
+                    api.save_data(df)
+                    if aqi_map:
+                        api.save_map(aqi_map)
                 
-                print(f"\n=== 程式執行完成 ===")
-                print("請在瀏覽器中開啟 outputs/ 資料夾中的HTML檔案查看AQI地圖")
+                    print(f"\n=== 程式執行完成 ===")
+                    print("請在瀏覽器中開啟 outputs/ 資料夾中的HTML檔案查看AQI地圖")
                 
-            else:
-                print("沒有提取到有效的AQI資料")
+                else:
+                    print("沒有提取到有效的AQI資料")
         
     except Exception as e:
         print(f"程式執行錯誤: {e}")
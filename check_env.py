@@ -4,18 +4,24 @@
 """
 
 import os
-from dotenv import load_dotenv
+from dotenv import dotenv_values, find_dotenv
 
-# 載入環境變數：
-# - 預設會讀取同目錄的 `.env` 檔案
-# - 將 KEY=VALUE 形式寫入到目前 Python 程式的環境變數中
-# - 這樣後續就能用 os.getenv("KEY") 取得設定值
-load_dotenv()
+# 讀取 `.env`：
+# - find_dotenv 與 load_dotenv() 相同，從本程式所在目錄往上層尋找 `.env`，
+#   因此在其他目錄執行 `python path/to/check_env.py` 也找得到；找不到時回傳空字串
+# - dotenv_values 只讀取並解析一次 `.env`，回傳 {KEY: VALUE} 的 dict
+# - 後面檢查 API key 與 `.env` 檔案內容都直接使用這份結果，不必再開檔逐行掃描
+env_file = find_dotenv()
+env_values = dotenv_values(env_file) if env_file else {}
 
 # 檢查 API Key：
 # - 本專案優先使用 `MOENV_API_KEY`
 # - 若你習慣用 `API_KEY` 也能相容
-api_key = os.getenv('MOENV_API_KEY') or os.getenv('API_KEY')
+# - 與 load_dotenv() 相同：已存在的系統環境變數優先於 `.env` 的設定
+api_key = (
+    os.getenv('MOENV_API_KEY') or env_values.get('MOENV_API_KEY')
+    or os.getenv('API_KEY') or env_values.get('API_KEY')
+)
 
 print("=== 環境變數檢查 ===")
 # 注意：這裡會把整串 API key 印出來。
@@ -30,25 +36,18 @@ else:
     print("[錯誤] API_KEY 未正確設定")
     print("請在 .env 檔案中設定正確的API金鑰")
 
-# 進一步檢查 `.env` 檔案是否存在，並確認內容格式是否正確
-env_file = '.env'
-if os.path.exists(env_file):
+# 進一步檢查 `.env` 檔案是否存在，並確認內容是否正確
+if env_file:
     print(f"[成功] .env 檔案存在: {os.path.abspath(env_file)}")
     
-    # 讀取檔案內容（不顯示完整金鑰）
-    with open(env_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-        lines = content.split('\n')
-        for line in lines:
-            # 尋找 KEY=VALUE 形式的設定行
-            if line.startswith('MOENV_API_KEY=') or line.startswith('API_KEY='):
-                key_value = line.split('=', 1)
-                if len(key_value) > 1:
-                    key = key_value[1]
-                    if key == 'your_api_key_here':
-                        print("[錯誤] .env 檔案中的API_KEY仍是預設值")
-                    else:
-                        print(f"[成功] .env 檔案中的API_KEY已設定 (長度: {len(key)})")
-                break
+    # 使用上面已解析好的 env_values（不顯示完整金鑰）
+    for name in ('MOENV_API_KEY', 'API_KEY'):
+        key = env_values.get(name)
+        if key is not None:
+            if key == 'your_api_key_here':
+                print("[錯誤] .env 檔案中的API_KEY仍是預設值")
+            else:
+                print(f"[成功] .env 檔案中的API_KEY已設定 (長度: {len(key)})")
+            break
 else:
     print("[錯誤] .env 檔案不存在")
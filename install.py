@@ -100,7 +100,15 @@ def manual_install():
         "python-dotenv", 
         "pandas",
         "folium",
-        "matplotlib"
+        "orjson"
+    ]
+
+    # 選用套件：安裝失敗不影響主程式執行（程式會自動改用較慢的替代做法）
+    # - numba：大量座標（NUMBA_MIN_ROWS 筆以上）的距離計算使用 JIT 編譯的迴圈
+    # - pyarrow：輸出 Parquet 檔，並加速 CSV 寫入
+    optional_packages = [
+        "numba",
+        "pyarrow"
     ]
     
     print("\n正在手動安裝必要套件...")
@@ -115,6 +123,13 @@ def manual_install():
                 success_count += 1
     
     print(f"\n安裝結果: {success_count}/{len(required_packages)} 個套件安裝成功")
+
+    print("\n正在安裝選用套件...")
+    for package in optional_packages:
+        if check_package(package.replace("-", "_")):
+            print(f"[成功] {package} 已安裝")
+        elif not install_package(package):
+            print(f"[略過] {package} 為選用套件，未安裝也能執行")
     
     if success_count == len(required_packages):
         print("[成功] 所有套件安裝完成！")